@@ -0,0 +1,69 @@
+"""Cold-start benchmark for the headless signal engine.
+
+Each run spawns a fresh interpreter so module caches are cold, then times
+importing bot.py, constructing a headless bot and loading the indicator
+stack (the point at which the engine can produce signals).
+
+Usage: python bench_startup.py [--runs N] [--target SECONDS]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import bot
+t1 = time.perf_counter()
+engine = bot.ProfessionalScalpingBot(headless=True)
+t2 = time.perf_counter()
+bot.load_indicators()
+t3 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0,
+    "init": t2 - t1,
+    "indicators": t3 - t2,
+    "total": t3 - t0,
+    "telegram_loaded": "telegram" in sys.modules,
+}))
+'''
+
+
+def run_probe():
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=here, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target', type=float, default=1.0)
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+    for phase in ("import", "init", "indicators", "total"):
+        values = [r[phase] for r in results]
+        print(f"{phase:>10}: median {statistics.median(values) * 1000:7.1f} ms"
+              f" | max {max(values) * 1000:7.1f} ms")
+
+    if any(r["telegram_loaded"] for r in results):
+        print("FAIL: Telegram imported by the headless engine")
+        return 1
+
+    median_total = statistics.median(r["total"] for r in results)
+    if median_total > args.target:
+        print(f"FAIL: median startup {median_total:.3f}s exceeds {args.target:.3f}s target")
+        return 1
+    print(f"OK: median startup {median_total:.3f}s within {args.target:.3f}s target")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
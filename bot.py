@@ -1,18 +1,25 @@
+from __future__ import annotations
+
 import os
+import json
+import argparse
 import logging
 import time
-import threading
-import numpy as np
+import asyncio
+from signal import SIGINT, SIGTERM
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
 import requests
 import pytz
-from telegram import Update
-from telegram.ext import Updater, CommandHandler, CallbackContext
 from dotenv import load_dotenv
-import talib
 import random
-from flask import Flask  # Required for anti-sleep functionality
-import os
+
+# python-telegram-bot, NumPy and TA-Lib are imported lazily so the
+# signal engine can be imported and run headless without paying for them
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
+
 os.environ['TA_LIBRARY_PATH'] = os.path.expanduser('~/ta-lib/lib')
 os.environ['LD_LIBRARY_PATH'] = os.path.expanduser('~/ta-lib/lib') + ':' + os.environ.get('LD_LIBRARY_PATH', '')
 # Load environment variables
@@ -82,14 +89,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app for anti-sleep
-app = Flask(__name__)
-@app.route('/')
-def home():
-    return "🚀 Professional Scalping Bot Active | " + datetime.utcnow().isoformat()
+def load_indicators():
+    """Import NumPy and TA-Lib on first use of the indicator pipeline"""
+    import numpy as np
+    import talib
+    return np, talib
 
 class ProfessionalScalpingBot:
-    def __init__(self):
+    def __init__(self, headless=False):
+        # Headless mode runs the signal engine without the health server or Telegram
+        self.headless = headless
+        self.application = None
+        
+        # Asyncio runtime: every service is a task on one event loop, so the
+        # shared state below is only ever touched from the loop thread
+        self.tasks = []
+        self.stop_event = None
+        
         # Initialize price tracking
         self.live_prices = {pair: None for pair in PAIRS}
         self.spreads = {pair: 0.0 for pair in PAIRS}
@@ -109,32 +125,13 @@ class ProfessionalScalpingBot:
         self.starting_balance = 100
         self.current_balance = 100
         
-        # Initialize Telegram
-        self.updater = Updater(TELEGRAM_TOKEN, use_context=True)
-        self.updater.start_polling()
-        
-        # Add command handlers
-        handlers = [
-            CommandHandler('start', self.start),
-            CommandHandler('subscribe', self.subscribe),
-            CommandHandler('status', self.bot_status),
-            CommandHandler('performance', self.performance_report),
-            CommandHandler('resume', self.resume_trading),
-            CommandHandler('cooldown', self.cooldown_pair),
-            CommandHandler('health', self.health_check)
-        ]
-        for handler in handlers:
-            self.updater.dispatcher.add_handler(handler)
-        
-        # Start services
-        self.start_services()
         logger.info("Professional Scalping Bot Initialized")
 
     # ======================
     # ENHANCED API MANAGEMENT
     # ======================
     
-    def api_request(self, url, params=None, cache_key=None, cache_duration=60):
+    async def api_request(self, url, params=None, cache_key=None, cache_duration=60):
         """Highly optimized API request with budget management"""
         # Reset call count every minute
         if time.time() - self.api_budget_reset_time > 60:
@@ -146,7 +143,7 @@ class ProfessionalScalpingBot:
             sleep_time = 60 - (time.time() - self.api_budget_reset_time)
             if sleep_time > 0:
                 logger.warning(f"API limit reached. Sleeping for {sleep_time:.1f}s")
-                time.sleep(sleep_time)
+                await self.pause(sleep_time)
                 self.api_call_count = 0
                 self.api_budget_reset_time = time.time()
         
@@ -161,9 +158,8 @@ class ProfessionalScalpingBot:
             params = params or {}
             params['api_key'] = TRADEMADE_API_KEY
             
-            response = requests.get(url, params=params, timeout=3)
-            response.raise_for_status()
-            data = response.json()
+            # Blocking HTTP runs in the executor; cache and budget stay on the loop
+            data = await asyncio.to_thread(self.fetch_json, url, params, 3)
             
             # Update cache
             if cache_key:
@@ -182,11 +178,18 @@ class ProfessionalScalpingBot:
             logger.error(f"Unexpected API error: {str(e)}")
             return None
 
+    @staticmethod
+    def fetch_json(url, params, timeout):
+        """Blocking GET returning decoded JSON (runs in the executor)"""
+        response = requests.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
     # ======================
     # ENHANCED RISK MANAGEMENT
     # ======================
     
-    def update_performance(self, pair, outcome):
+    async def update_performance(self, pair, outcome):
         """Track performance and manage circuit breakers"""
         # Update trade history
         self.trade_history.append({
@@ -204,7 +207,7 @@ class ProfessionalScalpingBot:
             # Global circuit breaker after 3 consecutive losses
             if self.consecutive_losses >= 3:
                 self.halted_until = time.time() + 3600  # 1-hour halt
-                self.notify_users("🚨 CIRCUIT BREAKER: Trading halted for 1 hour after 3 consecutive losses")
+                await self.notify_users("🚨 CIRCUIT BREAKER: Trading halted for 1 hour after 3 consecutive losses")
         else:
             self.consecutive_losses = 0
             
@@ -239,7 +242,7 @@ class ProfessionalScalpingBot:
     # SCALPING ENGINE
     # ======================
     
-    def analyze_pair(self, pair):
+    async def analyze_pair(self, pair):
         """Multi-timeframe analysis for scalping signals"""
         if not self.check_trading_allowed(pair):
             return None
@@ -250,7 +253,7 @@ class ProfessionalScalpingBot:
         url = "https://marketdata.trademade.com/api/v1/live"
         params = {"currency": pair}
         
-        price_data = self.api_request(url, params, f"live_{pair}", 15)
+        price_data = await self.api_request(url, params, f"live_{pair}", 15)
         if not price_data or 'quotes' not in price_data or not price_data['quotes']:
             return None
             
@@ -267,15 +270,24 @@ class ProfessionalScalpingBot:
         # Get historical data (use cached data when possible)
         tf1 = self.api_cache.get(f"hist_{pair}_minute")
         if not tf1 or time.time() - tf1['timestamp'] > 120:
-            tf1 = self.get_historical_data(pair, "minute", 30)
+            tf1 = await self.get_historical_data(pair, "minute", 30)
             
         tf5 = self.api_cache.get(f"hist_{pair}_minute5")
         if not tf5 or time.time() - tf5['timestamp'] > 300:
-            tf5 = self.get_historical_data(pair, "minute5", 120)
+            tf5 = await self.get_historical_data(pair, "minute5", 120)
             
         if not tf1 or not tf5:
             return None
             
+        # Indicator math is CPU-bound; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.evaluate_signal, pair, price, tf1, tf5)
+
+    def evaluate_signal(self, pair, price, tf1, tf5):
+        """Compute indicators on fetched candles and build a signal (runs in the executor)"""
+        config = PAIR_CONFIG[pair]
+        np, talib = load_indicators()
+        
         # 1. Trend analysis
         closes_5 = np.array([c['close'] for c in tf5[-6:]])
         if len(closes_5) < 5:
@@ -348,7 +360,7 @@ class ProfessionalScalpingBot:
             
         return None
 
-    def get_historical_data(self, pair, timeframe, minutes=60):
+    async def get_historical_data(self, pair, timeframe, minutes=60):
         """Efficient historical data fetcher"""
         url = "https://marketdata.trademade.com/api/v1/timeseries"
         params = {
@@ -360,7 +372,7 @@ class ProfessionalScalpingBot:
             "period": 1
         }
         
-        data = self.api_request(url, params, f"hist_{pair}_{timeframe}", 300)
+        data = await self.api_request(url, params, f"hist_{pair}_{timeframe}", 300)
         if not data or 'quotes' not in data:
             return None
             
@@ -382,7 +394,7 @@ class ProfessionalScalpingBot:
     # CORE SERVICES
     # ======================
     
-    def market_session_manager(self):
+    async def market_session_manager(self):
         """Manage trading sessions efficiently"""
         while self.running:
             now_utc = datetime.utcnow()
@@ -394,16 +406,16 @@ class ProfessionalScalpingBot:
             self.new_york_open = 12 <= hour < 20
             self.overlap_open = 12 <= hour < 16
             
-            time.sleep(300)  # Check every 5 minutes
+            await self.pause(300)  # Check every 5 minutes
 
-    def signal_generation_engine(self):
+    async def signal_generation_engine(self):
         """Efficient signal generation with resource limits"""
         while self.running:
             # Get current resource usage
             ram_usage = self.get_memory_usage()
             if ram_usage > 80:  # Over 80% RAM usage
                 logger.warning("High RAM usage. Pausing signals.")
-                time.sleep(30)
+                await self.pause(30)
                 continue
                 
             # Prioritize pairs based on session
@@ -417,26 +429,28 @@ class ProfessionalScalpingBot:
                 pairs = ["GBPJPY"]  # Focus on JPY pairs during Tokyo
             else:
                 pairs = []
-                time.sleep(30)
+                await self.pause(30)
                 continue
                 
             for pair in pairs:
+                if not self.running:
+                    break
                 try:
                     # Check API budget
                     if self.api_call_count >= RATE_LIMITS["trademade"] * 0.8:
-                        time.sleep(5)
+                        await self.pause(5)
                         continue
                         
-                    signal = self.analyze_pair(pair)
+                    signal = await self.analyze_pair(pair)
                     if signal:
-                        self.send_signal_alert(signal)
+                        await self.send_signal_alert(signal)
                         # Cooldown period
-                        time.sleep(10)
+                        await self.pause(10)
                 except Exception as e:
                     logger.error(f"Error processing {pair}: {str(e)}")
                     
             # Adaptive sleep
-            time.sleep(15)
+            await self.pause(15)
 
     def get_memory_usage(self):
         """Simulate memory usage monitoring"""
@@ -447,34 +461,57 @@ class ProfessionalScalpingBot:
     # ANTI-SLEEP & HEALTH MONITORING
     # ======================
     
-    def start_flask_server(self):
-        """Start Flask server to prevent Render sleep"""
+    async def health_server(self):
+        """Serve the anti-sleep endpoint on the event loop to prevent Render sleep"""
         if RENDER_URL:
-            logger.info(f"Starting Flask server at {RENDER_URL}")
-        app.run(host='0.0.0.0', port=5000)
+            logger.info(f"Starting health server at {RENDER_URL}")
+        server = await asyncio.start_server(self.handle_health_request, '0.0.0.0', 5000)
+        async with server:
+            await self.stop_event.wait()
+
+    async def handle_health_request(self, reader, writer):
+        """Answer any HTTP request with a plain-text liveness banner"""
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            pass
+            
+        body = ("🚀 Professional Scalping Bot Active | " + datetime.utcnow().isoformat()).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; charset=utf-8\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: close\r\n\r\n" + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
         
-    def health_monitor(self):
+    async def health_monitor(self):
         """Ping health endpoint to keep Render instance awake"""
         while self.running:
             try:
                 if RENDER_URL:
-                    requests.get(RENDER_URL, timeout=5)
+                    await asyncio.to_thread(requests.get, RENDER_URL, timeout=5)
             except Exception as e:
                 logger.warning(f"Health ping failed: {str(e)}")
-            time.sleep(300)  # Ping every 5 minutes
+            await self.pause(300)  # Ping every 5 minutes
 
-    def health_check(self, update: Update, context: CallbackContext):
+    async def health_check(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Manual health check command"""
         status = "✅ Bot Operational\n"
         status += f"API Calls: {self.api_call_count}/min\n"
         status += f"Uptime: {timedelta(seconds=time.time() - self.start_time)}"
-        update.message.reply_text(status)
+        await update.message.reply_text(status)
 
     # ======================
     # ENHANCED TELEGRAM INTEGRATION
     # ======================
     
-    def send_signal_alert(self, signal: dict):
+    async def send_signal_alert(self, signal: dict):
         """Send scalping signal with MT5 execution templates"""
         config = PAIR_CONFIG[signal["pair"]]
         pip_size = config['pip_size']
@@ -515,7 +552,7 @@ class ProfessionalScalpingBot:
             f"📊 *Performance Stats*\n"
             f"Win Rate: {self.calculate_win_rate()}% | Balance: ${self.current_balance:.2f}"
         )
-        self.notify_users(message)
+        await self.notify_users(message)
         logger.info(f"Sent signal: {signal['pair']} {signal['direction']}")
 
     def calculate_win_rate(self):
@@ -525,11 +562,52 @@ class ProfessionalScalpingBot:
         wins = sum(1 for t in self.trade_history if t['outcome'] == 'win')
         return (wins / len(self.trade_history)) * 100
 
-    def notify_users(self, message: str):
+    async def start_telegram(self):
+        """Start Telegram polling on the shared event loop and register command handlers"""
+        from telegram.ext import Application, CommandHandler
+        
+        application = Application.builder().token(TELEGRAM_TOKEN).build()
+        
+        # Add command handlers
+        handlers = [
+            CommandHandler('start', self.start),
+            CommandHandler('subscribe', self.subscribe),
+            CommandHandler('status', self.bot_status),
+            CommandHandler('performance', self.performance_report),
+            CommandHandler('resume', self.resume_trading),
+            CommandHandler('cooldown', self.cooldown_pair),
+            CommandHandler('health', self.health_check)
+        ]
+        for handler in handlers:
+            application.add_handler(handler)
+            
+        # Drive the application ourselves instead of run_polling(), which
+        # would take over the event loop
+        await application.initialize()
+        await application.start()
+        await application.updater.start_polling()
+        self.application = application
+        logger.info("Telegram polling started")
+
+    async def stop_telegram(self):
+        """Stop polling and release the Telegram application"""
+        application, self.application = self.application, None
+        if application is None:
+            return
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+
+    async def notify_users(self, message: str):
         """Send message to subscribed users"""
+        if self.application is None:
+            # Headless or Telegram still starting: keep the signal in the log
+            logger.info(message)
+            return
+            
         for user_id in list(self.subscribed_users):
             try:
-                self.updater.bot.send_message(
+                await self.application.bot.send_message(
                     chat_id=user_id,
                     text=message,
                     parse_mode="Markdown"
@@ -541,10 +619,10 @@ class ProfessionalScalpingBot:
     # COMMAND HANDLERS
     # ======================
     
-    def start(self, update: Update, context: CallbackContext):
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         self.subscribed_users.add(user_id)
-        update.message.reply_text(
+        await update.message.reply_text(
             "💎 *Professional Scalping Bot Activated* 💎\n\n"
             "Features:\n"
             "- Multi-timeframe analysis\n"
@@ -554,12 +632,12 @@ class ProfessionalScalpingBot:
             "Execute signals immediately for optimal results!"
         )
 
-    def subscribe(self, update: Update, context: CallbackContext):
+    async def subscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         self.subscribed_users.add(user_id)
-        update.message.reply_text("✅ You're now receiving professional scalping signals!")
+        await update.message.reply_text("✅ You're now receiving professional scalping signals!")
         
-    def bot_status(self, update: Update, context: CallbackContext):
+    async def bot_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show bot status"""
         status = (
             f"🏦 *Market Sessions (UTC)*\n"
@@ -572,12 +650,12 @@ class ProfessionalScalpingBot:
             f"Consecutive Losses: {self.consecutive_losses}\n"
             f"Balance: ${self.current_balance:.2f}"
         )
-        update.message.reply_text(status, parse_mode="Markdown")
+        await update.message.reply_text(status, parse_mode="Markdown")
         
-    def performance_report(self, update: Update, context: CallbackContext):
+    async def performance_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show performance report"""
         if not self.trade_history:
-            update.message.reply_text("No trades recorded yet")
+            await update.message.reply_text("No trades recorded yet")
             return
             
         win_rate = self.calculate_win_rate()
@@ -600,15 +678,15 @@ class ProfessionalScalpingBot:
             f"Balance: ${self.current_balance:.2f}\n\n"
             f"🔒 Circuit Breaker: {self.consecutive_losses}/3"
         )
-        update.message.reply_text(message, parse_mode="Markdown")
+        await update.message.reply_text(message, parse_mode="Markdown")
         
-    def resume_trading(self, update: Update, context: CallbackContext):
+    async def resume_trading(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Resume trading after halt"""
         self.halted_until = None
         self.consecutive_losses = 0
-        update.message.reply_text("✅ Trading resumed. Circuit breaker reset.")
+        await update.message.reply_text("✅ Trading resumed. Circuit breaker reset.")
         
-    def cooldown_pair(self, update: Update, context: CallbackContext):
+    async def cooldown_pair(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Manually cooldown a pair"""
         try:
             pair = context.args[0].upper()
@@ -616,17 +694,17 @@ class ProfessionalScalpingBot:
             
             if pair in PAIRS:
                 self.pair_cooldowns[pair] = time.time() + (minutes * 60)
-                update.message.reply_text(f"⏳ {pair} cooldown activated for {minutes} minutes")
+                await update.message.reply_text(f"⏳ {pair} cooldown activated for {minutes} minutes")
             else:
-                update.message.reply_text("Invalid pair. Available pairs: " + ", ".join(PAIRS))
-        except:
-            update.message.reply_text("Usage: /cooldown [PAIR] [MINUTES]")
+                await update.message.reply_text("Invalid pair. Available pairs: " + ", ".join(PAIRS))
+        except Exception:
+            await update.message.reply_text("Usage: /cooldown [PAIR] [MINUTES]")
 
     # ======================
     # BOT MANAGEMENT
     # ======================
     
-    def start_services(self):
+    async def start_services(self):
         """Start core services with resource awareness"""
         # Track start time for uptime calculation
         self.start_time = time.time()
@@ -639,37 +717,97 @@ class ProfessionalScalpingBot:
         self.new_york_open = 12 <= hour < 20
         self.overlap_open = 12 <= hour < 16
         
-        # Start Flask server in separate thread
-        flask_thread = threading.Thread(target=self.start_flask_server, daemon=True)
-        flask_thread.start()
-        
-        # Start health monitor
-        health_thread = threading.Thread(target=self.health_monitor, daemon=True)
-        health_thread.start()
-        
-        # Start trading services
+        # Start all services at once; none depends on another being up
         services = [
-            self.market_session_manager,
-            self.signal_generation_engine
+            self.market_session_manager(),
+            self.signal_generation_engine()
         ]
+        if not self.headless:
+            services += [
+                self.start_telegram(),
+                self.health_server(),
+                self.health_monitor()
+            ]
         
-        for service in services:
-            t = threading.Thread(target=service, daemon=True)
-            t.start()
-            time.sleep(1)
+        self.tasks = [asyncio.create_task(service) for service in services]
+        for task in self.tasks:
+            task.add_done_callback(self.on_service_done)
+
+    def on_service_done(self, task):
+        """Log services that die with an error instead of exiting on shutdown"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Service crashed: {task.exception()!r}")
+
+    async def pause(self, seconds):
+        """Sleep for up to `seconds`, waking immediately on shutdown"""
+        if self.stop_event is None:
+            await asyncio.sleep(seconds)
+            return
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def stop(self):
+        """Request shutdown; every service loop exits at its next pause"""
+        self.running = False
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    async def shutdown(self, timeout=10):
+        """Wait for services to finish, cancelling any that overrun"""
+        self.stop()
+        if self.tasks:
+            _, pending = await asyncio.wait(self.tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self.stop_telegram()
+        logger.info("Professional Scalping Bot Stopped")
             
-    def run(self):
+    async def scan_once(self, pairs=None):
+        """Analyze each pair once and return the signals produced"""
+        signals = []
+        pairs = pairs or PAIRS
+        results = await asyncio.gather(
+            *(self.analyze_pair(pair) for pair in pairs),
+            return_exceptions=True
+        )
+        for pair, result in zip(pairs, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing {pair}: {str(result)}")
+            elif result:
+                signals.append(result)
+        return signals
+        
+    async def serve(self):
         """Main run loop with resource monitoring"""
+        self.stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (SIGINT, SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass  # Windows: fall back to KeyboardInterrupt
+                
+        await self.start_services()
         logger.info("Professional Scalping Bot Started")
         last_cleanup = time.time()
         
-        while self.running:
-            # Cleanup old cache hourly
-            if time.time() - last_cleanup > 3600:
-                self.cleanup_cache()
-                last_cleanup = time.time()
-                
-            time.sleep(300)
+        try:
+            while self.running:
+                # Cleanup old cache hourly
+                if time.time() - last_cleanup > 3600:
+                    self.cleanup_cache()
+                    last_cleanup = time.time()
+                    
+                await self.pause(300)
+        finally:
+            await self.shutdown()
+
+    def run(self):
+        """Run every service on a single asyncio event loop until stopped"""
+        asyncio.run(self.serve())
 
     def cleanup_cache(self):
         """Clean up old cache entries"""
@@ -685,7 +823,24 @@ class ProfessionalScalpingBot:
             
         logger.info(f"Cache cleanup: Removed {len(keys_to_delete)} items")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Professional Scalping Bot")
+    parser.add_argument('--headless', action='store_true',
+                        help="run the signal engine without the health server or Telegram")
+    parser.add_argument('--once', action='store_true',
+                        help="scan pairs once, print signals as JSON and exit")
+    parser.add_argument('--pairs', nargs='+', choices=PAIRS,
+                        help="pairs to scan with --once (default: all)")
+    return parser.parse_args(argv)
+
 # Start the bot
 if __name__ == '__main__':
-    bot = ProfessionalScalpingBot()
-    bot.run()
+    args = parse_args()
+    if args.once:
+        # One-shot worker mode for replay/backtest pipelines
+        bot = ProfessionalScalpingBot(headless=True)
+        for signal in asyncio.run(bot.scan_once(args.pairs)):
+            print(json.dumps(signal))
+    else:
+        bot = ProfessionalScalpingBot(headless=args.headless)
+        bot.run()